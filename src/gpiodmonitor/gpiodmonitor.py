@@ -6,247 +6,29 @@ Thus it depends on python3-gpiod being installed:
 https://git.kernel.org/pub/scm/libs/libgpiod/libgpiod.git
 """
 
-import contextlib
-import dataclasses
 import logging
+import os
+import queue
+import selectors
 import sys
+import threading
 import time
 
-from typing import Dict, List, Callable, Optional, Iterator
+from typing import Any, Dict, List, Callable, Optional, Tuple
 
 # pylint: disable=import-error
 import gpiod  # type: ignore
 
-logger: logging.Logger = logging.getLogger(__name__)
-
-# configure time [ms] over which a new signal has to be stable before
-# a change in state is assumed
-
-# after which time to check the state [ms]
-DEBOUNCE_CHECK_INTERVAL: int = 5
-# how long has a change to "active" to be stable [ms]
-DEBOUNCE_ACTIVE_INTERVAL: int = 10
-# how long has a change to "inactive" to be stable [ms]
-DEBOUNCE_INACTIVE_INTERVAL: int = 100
-
-
-@dataclasses.dataclass
-class TimedCallback:
-    """Holds a modifieable time in ms and a callback."""
-    callback: Callable[[int], None]
-    time: int = 0
-
-class GPIOPin:
-    # pylint: disable=too-many-instance-attributes
-    """Class to hold data associated with each registered pin.
-
-    Holds:
-    * the current state (this will only change after debouncing the
-      signal)
-    * the state of the countdown
-    * a list of callback functions to be called on a change to active /
-      inactive
-
-    Attributes:
-        _num: The number of the pin.
-        _active: Is the pin in active state?
-        _countdown: This is activated on raw pin state change and
-            decreases with every tick. If it reaches zero the state is
-            asssumed to be stable.
-        _countup: This counts up as soon as an active signal is stable.
-            This is used to trigger callbacks in `on_long_active`.
-        on_active: Functions to call on state change to "active".
-        on_inactive: Functions to call on state change to "inactive".
-        on_long_active: Functions to call if the state has been
-            "active" for X ms.
-        on_pulsed_active: Functions to call repetitively in intervals of
-            X ms if the state stays "active".
-        _stack_long: A working copy of `on_long_active` where all called
-            callbacks are popped off.
-        _stack_pulsed: A working copy of `on_pulsed_active` where times
-            are changed.
-    """
-    # save some space by using slots
-    __slots__ = ('_num', '_active', '_countdown', '_countup', 'on_active',
-                 'on_inactive', 'on_long_active', 'on_pulsed_active',
-                 '_stack_long', '_stack_pulsed')
-
-    active_interval: int = DEBOUNCE_ACTIVE_INTERVAL
-    inactive_interval: int = DEBOUNCE_INACTIVE_INTERVAL
-    check_interval: int = DEBOUNCE_CHECK_INTERVAL
-
-    def __init__(self, num: int) -> None:
-        """Initialise the accessible variables.
-
-        Arguments:
-            num: The number of the pin.
-        """
-
-        self._num: int = num
-        # key is initially assumed to be not pressed
-        self._active: bool = False
-        # the countdown to accept a signal as "pressed"
-        self._countdown: int = GPIOPin.active_interval
-        # the countup to accept a signal  as "long_pressed"
-        self._countup: int = 0
-        self.on_active: List[Callable[[int], None]] = []
-        self.on_inactive: List[Callable[[int], None]] = []
-        # list of callback functions that should be fired after a
-        # certain interval
-        self.on_long_active: List[TimedCallback] = []
-        # list of callback functions that should be fired certain
-        # intervals
-        self.on_pulsed_active: List[TimedCallback] = []
-        # working copies
-        self._stack_long: List[TimedCallback] = []
-        self._stack_pulsed: List[TimedCallback] = []
-
-    def set_state(self, active: bool) -> None:
-        """This function is called once the signal has stably changed.
-
-        Attributes:
-            active: Is the state "active"?
-        """
-
-        logger.debug('pin: %s, state: %s', self._num, active)
-        self._active = active
-        if active:
-            for callback in self.on_active:
-                callback(self._num)
-        else:
-            for callback in self.on_inactive:
-                callback(self._num)
-
-    def is_active(self) -> bool:
-        """Is the pin active?
-
-        Returns:
-            Is the stable state of the pin "active"?
-        """
-        return self._active
-
-    def reset_countdown(self) -> None:
-        """Reset the countdown for a signal to be stable.
-
-        The length of the interval before a signal is considered stable
-        depends on the state. React faster for changes to "active", the
-        user might not be patient.
-        """
-
-        if self._active:
-            self._countdown = GPIOPin.inactive_interval
-        else:
-            self._countdown = GPIOPin.active_interval
-
-    # pylint: disable=too-many-branches
-    def tick(self, raw_active: bool) -> None:
-        """Debounce a change to active / inactive.
-
-        This function is called every DEBOUNCE_CHECK_INTERVAL
-        milliseconds.
-
-        If the raw state of a pin differs from its known state this
-        function tries to determine if it's a real change or just
-        noise:
-        A countdown is started and with every check that holds the new
-        state the count is decreased.
-        If the count reaches 0 the new state is accepted. If a the old
-        state is detected inbetween the countdown is reset and starts
-        again if a new state is detected.
-
-        Example for DEBOUNCE_CHECK_INTERVAL = 5 ms and
-        DEBOUNCE_ACTIVE_INTERVAL = 15 ms
-
-        Time [ms]:  0  5 10 15 20 25 30 35
-        Check:      1  2  3  4  5  6  7  8
-        Signal:     0  1  1  0  1  1  1  1
-                       ^  ^  ^  ^  ^  ^  ^
-                       |  |  |  |  |  |  |
-                       |  |  |  |  |  |  no change -> do nothing
-                       |  |  |  |  |  signal stable -> count reaches 0
-                       |  |  |  |  |                -> emit event
-                       |  |  |  |  signal stable -> count decreases
-                       |  |  |  countdown starts
-                       |  |  signal does not seem stable -> reset
-                       |  signal stable -> count decreased
-                       countdown starts
-
-        Adaption of: https://my.eng.utah.edu/~cs5780/debouncing.pdf
+from gpiodmonitor.gpiopin import (DEBOUNCE_ACTIVE_INTERVAL,
+                                  DEBOUNCE_CHECK_INTERVAL,
+                                  DEBOUNCE_INACTIVE_INTERVAL, GPIOPin,
+                                  TimedCallback, call_now, insort_timed)
 
-        Arguments:
-            raw_state: The state as read from the pin ("line").
-        """
-
-        if raw_active == self._active:
-            # state does not differ from the last accepted state
-            # so reset the countdown
-            self.reset_countdown()
-            # if the state is active
-            if self._active:
-                # count up
-                self._countup += GPIOPin.check_interval
-
-                to_pop: List = []
-                for i, timed_callback in enumerate(self._stack_long):
-                    if self._countup >= timed_callback.time:
-                        # fire callback
-                        timed_callback.callback(self._num)
-                        # mark to remove the callback-tuple from the
-                        # list of available callbacks
-                        # do not do so now as the stack / loop would get
-                        # mixed up
-                        to_pop.append(i)
-                    else:
-                        # break loop
-                        # the list is sorted by the length needed for
-                        # the signal to be active
-                        # all following items will need an even larger
-                        # value of `_countup`
-                        break
-
-                # remove fired callbacks
-                for i in to_pop:
-                    self._stack_long.pop(i)
-
-                # check if it is time to fire a pulsed event
-                sort: bool = False
-                for i, timed_callback in enumerate(self._stack_pulsed):
-                    if self._countup >= timed_callback.time:
-                        timed_callback.callback(self._num)
-                        # set time for next pulse by adding the original
-                        # interval to the time of the current pulse
-                        timed_callback.time += self.on_pulsed_active[i].time
-                        sort = True
-                    else:
-                        break
-
-                if sort:
-                    self._stack_pulsed.sort(key=lambda x: x.time)
-        else:
-            # state is not the last accepted state
-            # so decrease the count by DEBOUNCE_CHECK_INTERVAL
-            self._countdown -= GPIOPin.check_interval
-
-            if self._countdown == 0:
-                # signal seems stable
-                # accept the new state
-                self.set_state(raw_active)
-                # and prepare the countdown for the next change
-                self.reset_countdown()
-                # if the new state is active
-                if self._active:
-                    # create a working copy
-                    self._stack_long = self.on_long_active.copy()
-                    # do not use deepcopy as it might raise
-                    # complications when using multiprocessing
-                    self._stack_pulsed = [
-                            TimedCallback(item.callback, item.time) for
-                            item in self.on_pulsed_active]
-                    # and reset countup
-                    self._countup = 0
+logger: logging.Logger = logging.getLogger(__name__)
 
 
 class GPIODMonitor:
+    # pylint: disable=too-many-instance-attributes
     """Eventemitter using libgpiod and debouncing the raw signal.
 
     For the debouncing algorithm see:
@@ -255,7 +37,33 @@ class GPIODMonitor:
     Attributes:
         _chip_number: The number of the chip with the pins.
         _chip: The gpiod.Chip.
+        _lines: The requested lines in the order of `_pins`, `None` if
+            the chip is closed or no pins are registered.
+        _line_by_pin: The requested lines by the number of their pin.
         _pins: The pins by their number.
+        _events: The stable state changes of the current tick as tuples
+            of pin number and state.
+        _on_batch: Functions to call with `_events` after each tick
+            that produced any.
+        _pins_ordered: The pins in the order of `_lines`, frozen when
+            the chip is opened.
+        _state_bits: The stable states of `_pins_ordered` packed into
+            an int, one byte per pin (lowest byte first), 1 if active.
+        _busy_bits: Packed like `_state_bits`, 1 for pins that need a
+            tick regardless of their raw state (see
+            `GPIOPin.needs_tick`).
+        _debouncing_bits: Packed like `_state_bits`, 1 for pins that
+            are being debounced (see `GPIOPin.is_debouncing`).
+        _callback_thread: Call the callbacks from a separate thread?
+        _callback_queue: The callbacks waiting for the callback thread
+            as tuples of callback and argument, `None` to stop it.
+        _callback_worker: The running callback thread.
+        _dispatch: Function the pins hand their callbacks to, see
+            `GPIOPin.dispatch`.
+        _active_interval: The interval it takes for a stable active
+            signal to trigger a change in state in milliseconds.
+        _inactive_interval: The interval it takes for a stable inactive
+            signal to trigger a change in state in milliseconds.
         check_interval: The interval with which to check the pins'
             state in milliseconds.
     """
@@ -264,7 +72,8 @@ class GPIODMonitor:
                  chip_number: int = 0,
                  check_interval: int = DEBOUNCE_CHECK_INTERVAL,
                  active_interval: int = DEBOUNCE_ACTIVE_INTERVAL,
-                 inactive_interval: int = DEBOUNCE_INACTIVE_INTERVAL):
+                 inactive_interval: int = DEBOUNCE_INACTIVE_INTERVAL,
+                 callback_thread: bool = False):
         # pylint: disable=too-many-arguments
         """Set default values.
 
@@ -277,15 +86,31 @@ class GPIODMonitor:
             inactive_interval: The interval it takes for a stable
                 inactive signal to trigger a change in state in
                 milliseconds.
+            callback_thread: Call the callbacks from a separate thread
+                while the chip is open so slow callbacks (I/O, ...) do
+                not delay reading the pins. Exceptions raised by the
+                callbacks are logged.
         """
         logger.debug('creating monitor on chip %s', chip_number)
         self._chip_number = chip_number
         self._chip: Optional[gpiod.Chip] = None
+        self._lines: Optional[gpiod.LineBulk] = None
+        self._line_by_pin: Dict[int, gpiod.Line] = {}
         self._pins: Dict[int, GPIOPin] = {}
+        self._events: List[Tuple[int, bool]] = []
+        self._on_batch: List[Callable[[List[Tuple[int, bool]]], None]] = []
+        self._pins_ordered: Tuple[GPIOPin, ...] = ()
+        self._state_bits: int = 0
+        self._busy_bits: int = 0
+        self._debouncing_bits: int = 0
+        self._callback_thread: bool = callback_thread
+        self._callback_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._callback_worker: Optional[threading.Thread] = None
+        self._dispatch: Callable[[Callable[[Any], None], Any], None] = \
+            call_now
         self.check_interval: int = check_interval
-        GPIOPin.check_interval = check_interval
-        GPIOPin.active_interval = active_interval
-        GPIOPin.inactive_interval = inactive_interval
+        self._active_interval: int = active_interval
+        self._inactive_interval: int = inactive_interval
 
     def get_pins(self) -> Dict[int, GPIOPin]:
         """Return the pins.
@@ -306,7 +131,31 @@ class GPIODMonitor:
         """
         if not self._chip:
             raise IOError('Chip not opened.')
-        return bool(self._chip.get_line(pin).get_value())
+        return bool(self._line_by_pin[pin].get_value())
+
+    def _get_pin(self, pin: int) -> GPIOPin:
+        """Return the pin with the given number, create it if needed.
+
+        Arguments:
+            pin: The BCM-number of the pin.
+
+        Returns:
+            The pin.
+
+        Raises:
+            IOError: If the pin is new and the chip is already open.
+        """
+        pin_obj: Optional[GPIOPin] = self._pins.get(pin)
+        if pin_obj is None:
+            if self._chip is not None:
+                # the lines have already been requested
+                raise IOError('Cannot register new pins while the chip '
+                              'is open.')
+            logger.debug('registering new pin %s', pin)
+            pin_obj = self._pins[pin] = GPIOPin(pin, self.check_interval,
+                                                self._active_interval,
+                                                self._inactive_interval)
+        return pin_obj
 
     def register(self,
                  pin: int,
@@ -324,100 +173,435 @@ class GPIODMonitor:
                 inctive.
         """
 
-        if not pin in self._pins:
-            logger.debug('registering new pin %s', pin)
-            self._pins[pin] = GPIOPin(pin)
+        pin_obj: GPIOPin = self._get_pin(pin)
         if on_active:
-            self._pins[pin].on_active.append(on_active)
+            pin_obj.on_active.append(on_active)
         if on_inactive:
-            self._pins[pin].on_inactive.append(on_inactive)
+            pin_obj.on_inactive.append(on_inactive)
+        pin_obj.freeze_callbacks()
 
     def register_long_active(self, pin: int, callback: Callable[[int], None],
                              seconds: float) -> None:
         """Register a callback for a long change to active.
 
+        If the pin is active while registering, the callback takes
+        effect with its next change to active.
+
         Arguments:
             pin: The BCM-number of the pin.
             callback: Function to call if the state changes to active.
             seconds: The time button needs to be pressed before
                 callback is fired.
         """
-        if not pin in self._pins:
-            logger.debug('registering new pin %s', pin)
-            self._pins[pin] = GPIOPin(pin)
-        self._pins[pin].on_long_active.append(
-                TimedCallback(callback, int(seconds * 1000)))
-        # sort callbacks by the time the button needs to be pressed
-        self._pins[pin].on_long_active.sort(key=lambda x: x.time)
+        pin_obj: GPIOPin = self._get_pin(pin)
+        insort_timed(pin_obj.on_long_active,
+                     TimedCallback(callback, int(seconds * 1000)))
+        pin_obj.invalidate_long()
 
     def register_pulsed_active(self, pin: int, callback: Callable[[int], None],
                                seconds: float) -> None:
         """Register a callback for a long change to active.
 
+        If the pin is active while registering, the callback takes
+        effect with its next change to active.
+
         Arguments:
             pin: The BCM-number of the pin.
             callback: Function to call if the state changes to active.
             seconds: The time button needs to be pressed before
                 callback is fired.
         """
-        if not pin in self._pins:
-            logger.debug('registering new pin %s', pin)
-            self._pins[pin] = GPIOPin(pin)
-        self._pins[pin].on_pulsed_active.append(
-                TimedCallback(callback, int(seconds * 1000)))
-        # sort callbacks by the time the button needs to be pressed
-        self._pins[pin].on_pulsed_active.sort(key=lambda x: x.time)
-
-    @contextlib.contextmanager
-    def open_chip(self) -> Iterator[gpiod.Chip]:
+        pin_obj: GPIOPin = self._get_pin(pin)
+        # a pulse cannot be shorter than a tick
+        insort_timed(pin_obj.on_pulsed_active,
+                     TimedCallback(callback,
+                                   max(int(seconds * 1000),
+                                       self.check_interval)))
+        pin_obj.invalidate_pulsed()
+
+    def register_batch(
+            self,
+            callback: Callable[[List[Tuple[int, bool]]], None]) -> None:
+        """Register a callback for all stable signal changes of a tick.
+
+        Instead of being called once per pin and change the callback is
+        called once at the end of each tick that changed the state of
+        any pin. It gets a list of tuples of the pin number and whether
+        the pin is now active. Useful if many pins are monitored, e.g.,
+        a keyboard matrix.
+
+        The callbacks registered via `register` are still fired.
+
+        Arguments:
+            callback: Function to call with the list of changes.
+        """
+        self._on_batch.append(callback)
+        for pin in self._pins.values():
+            pin.events = self._events
+
+    def _queue_callback(self, callback: Callable[[Any], None],
+                        argument: Any) -> None:
+        """Hand a callback to the callback thread.
+
+        Arguments:
+            callback: The function to call.
+            argument: The argument to call it with.
+        """
+        self._callback_queue.put((callback, argument))
+
+    def _run_callbacks(self) -> None:
+        """Call the queued callbacks until `None` is queued."""
+        while True:
+            item: Optional[Tuple[Callable[[Any], None], Any]] = \
+                self._callback_queue.get()
+            if item is None:
+                return
+            callback, argument = item
+            try:
+                callback(argument)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('callback %s failed', callback)
+
+    def open_chip(self) -> 'ChipContext':
         """Opens the chip and requests the registered lines.
 
-        Yields:
+        Use the returned context manager in a `with` statement, it
+        yields the handle of the chip and closes it on exit.
+
+        Returns:
+            The context manager.
+        """
+        return ChipContext(self)
+
+    def _open_chip(self) -> gpiod.Chip:
+        """Open the chip and request the registered lines.
+
+        Returns:
             The handle of the chip.
         """
         self._chip = gpiod.Chip(f'gpiochip{self._chip_number}')
 
         logger.debug('opened chip: %s', self._chip)
 
-        # pylint: disable=consider-iterating-dictionary
-        for i in self._pins.keys():
-            logger.debug('requesting line: %s',
-                         self._chip.get_line(i).offset())
-            self._chip.get_line(i).request(
+        if self._callback_thread:
+            self._dispatch = self._queue_callback
+            self._callback_worker = threading.Thread(
+                target=self._run_callbacks, name='GPIODMonitor callbacks',
+                daemon=True)
+            self._callback_worker.start()
+
+        # let the pins collect their changes if anyone is interested
+        # the pins log the state changes to the logger of their module
+        debug: bool = logging.getLogger(
+                GPIOPin.__module__).isEnabledFor(logging.DEBUG)
+        for pin in self._pins.values():
+            pin.events = self._events if self._on_batch else None
+            pin.dispatch = self._dispatch
+            pin.debug = debug
+
+        # freeze the order of the pins for the lines and the bits
+        pin_numbers: Tuple[int, ...] = tuple(self._pins)
+        self._pins_ordered = tuple(self._pins[i] for i in pin_numbers)
+        self._state_bits = 0
+        self._busy_bits = 0
+        self._debouncing_bits = 0
+        for i, pin in enumerate(self._pins_ordered):
+            self._state_bits |= pin.is_active() << (8 * i)
+            self._busy_bits |= pin.needs_tick() << (8 * i)
+            self._debouncing_bits |= pin.is_debouncing() << (8 * i)
+
+        # `Chip.get_lines` rejects an empty list, without pins there is
+        # nothing to request and `_lines` stays `None`
+        if pin_numbers:
+            # look up all lines with a single call and keep them in the
+            # order of the pins to read them at once
+            self._lines = self._chip.get_lines(list(pin_numbers))
+            self._line_by_pin = dict(zip(pin_numbers, self._lines))
+            logger.debug('requesting lines: %s', list(self._line_by_pin))
+            # and request them with a single call
+            self._lines.request(
                 consumer="GPIODMonitor",
-                type=gpiod.LINE_REQ_DIR_IN,
+                type=gpiod.LINE_REQ_EV_BOTH_EDGES,
                 flags=gpiod.LINE_REQ_FLAG_BIAS_PULL_UP
                 | gpiod.LINE_REQ_FLAG_ACTIVE_LOW)
-        yield self._chip
-        self._chip.close()
-        self._chip = None
+        # from now on `tick` does the actual work
+        self.tick = self._tick_open  # type: ignore[method-assign]
+        return self._chip
+
+    def _close_chip(self) -> None:
+        """Release the lines and close the chip."""
+        # uncover `tick` raising an IOError again
+        vars(self).pop('tick', None)
+        self._lines = None
+        self._line_by_pin = {}
+        if self._chip is not None:
+            self._chip.close()
+            self._chip = None
+        if self._callback_worker is not None:
+            # let the thread finish the queued callbacks
+            self._callback_queue.put(None)
+            self._callback_worker.join()
+            self._callback_worker = None
+            self._dispatch = call_now
+            for pin in self._pins.values():
+                pin.dispatch = call_now
+
+    def tick(self) -> None:  # pylint: disable=method-hidden
+        """Check the state of all registered pins.
+
+        While the chip is open this method is shadowed by `_tick_open`
+        on the instance, so the ticks do not need to test whether the
+        chip is open.
+
+        Raises:
+            IOError: The chip has not been opened.
+        """
+        raise IOError('Chip not opened.')
 
-    def tick(self) -> None:
-        """Check the state of all registered pins."""
-        if self._chip is None:
-            raise IOError('Chip not opened.')
+    def _tick_open(self) -> None:
+        """Check the state of all registered pins of the opened chip.
+
+        Only pins whose raw state differs from their stable state or
+        that need a tick anyway (see `GPIOPin.needs_tick`) are ticked.
+        Those are found for all pins at once by packing the values into
+        an int, one byte per pin, and XORing it with `_state_bits`.
+        """
+        # The cost of a tick, most expensive first:
+        #  1. reading the lines - libgpiod v1 issues one ioctl per line
+        #     for lines requested for events, even through
+        #     `LineBulk.get_values()`, which only saves the Python calls
+        #     per line
+        #  2. interpreter overhead per pin - only pins that differ from
+        #     their stable state or are busy are visited (see below)
+        #  3. wakeups while idle - avoided by sleeping on edge events in
+        #     `monitor`, ticks only run while something is going on
+        # Neither computation nor memory bandwidth is a bottleneck here,
+        # so vectorising or threading the pins would not pay off.
+
+        lines: Optional[gpiod.LineBulk] = self._lines
+        if lines is None:
+            # no pins registered
+            return
+        # read all lines with a single Python call, the 0 / 1 values are
+        # passed on as they are
+        values: List[int] = lines.get_values()
+        state_bits: int = self._state_bits
+        busy_bits: int = self._busy_bits
+        debouncing_bits: int = self._debouncing_bits
+        todo: int = ((int.from_bytes(bytes(values), 'little') ^ state_bits)
+                     | busy_bits)
+        pins: Tuple[GPIOPin, ...] = self._pins_ordered
+        while todo:
+            # the flags are the lowest bit of each byte so the lowest
+            # set bit is the flag of the next pin to tick
+            bit: int = todo & -todo
+            todo ^= bit
+            index: int = (bit.bit_length() - 1) >> 3
+            pin: GPIOPin = pins[index]
+            pin.tick(values[index])
+            if pin.is_active():
+                state_bits |= bit
+            else:
+                state_bits &= ~bit
+            # `needs_tick` without testing `is_debouncing` twice
+            if pin.is_debouncing():
+                debouncing_bits |= bit
+                busy_bits |= bit
+            else:
+                debouncing_bits &= ~bit
+                if pin.is_counting_up():
+                    busy_bits |= bit
+                else:
+                    busy_bits &= ~bit
+        self._state_bits = state_bits
+        self._busy_bits = busy_bits
+        self._debouncing_bits = debouncing_bits
+
+        if self._events:
+            events: List[Tuple[int, bool]] = self._events.copy()
+            self._events.clear()
+            for callback in self._on_batch:
+                self._dispatch(callback, events)
+
+    @staticmethod
+    def set_realtime() -> None:
+        """Pin the calling thread to a CPU and schedule it as SCHED_FIFO.
+
+        This reduces the scheduling jitter of the ticks on a busy
+        system. Needs CAP_SYS_NICE (e.g., run as root); if the
+        scheduling cannot be changed a warning is logged and the thread
+        is left as it was.
+        """
+        try:
+            # only pin the thread once it got the priority, pinning
+            # needs no privileges and would leave an unprivileged thread
+            # stuck on one CPU
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(20))
+            os.sched_setaffinity(0, {max(os.sched_getaffinity(0))})
+        except (AttributeError, OSError) as error:
+            logger.warning('could not set real-time scheduling: %s', error)
+
+    def _next_deadline(self, next_tick: float, now: float, interval: float,
+                       debouncing: bool) -> float:
+        """Determine when `monitor` has to tick next.
+
+        Arguments:
+            next_tick: The time of the last scheduled tick as returned by
+                `time.monotonic`.
+            now: The current time as returned by `time.monotonic`.
+            interval: `check_interval` in seconds.
+            debouncing: Is any pin being debounced?
+
+        Returns:
+            The time of the next tick as returned by `time.monotonic`.
+        """
+        if debouncing:
+            # check according to interval, measured from the last
+            # scheduled tick so the time spent in `tick` does not add up
+            next_tick += interval
+            # if a tick (or a callback) took longer than the interval,
+            # skip the missed ticks instead of running them back to back
+            return max(next_tick, now)
+        # nothing to debounce, wait for an edge or the next timed
+        # callback
+        return now + min(
+                min((pin.get_time_to_due() for pin in self._pins_ordered),
+                    default=sys.maxsize),
+                1000) / 1000
+
+    @staticmethod
+    def _wait_until(selector: selectors.BaseSelector, deadline: float,
+                    stop_on_edge: bool) -> float:
+        """Wait for the deadline and drain the lines' edge events.
+
+        Arguments:
+            selector: The selector the lines' event file descriptors are
+                registered with, the data of each key is the line.
+            deadline: When to stop waiting as returned by
+                `time.monotonic`.
+            stop_on_edge: Stop waiting as soon as an edge is reported.
+
+        Returns:
+            The time the wait ended as returned by `time.monotonic`.
+        """
+        monotonic: Callable[[], float] = time.monotonic
+        now: float = monotonic()
+        while now < deadline:
+            ready = selector.select(timeout=deadline - now)
+            for key, _ in ready:
+                # drop the events, `tick` reads the current values
+                key.data.event_read_multiple()
+            now = monotonic()
+            if ready and stop_on_edge:
+                break
+        return now
+
+    def _count_up(self, waited: int) -> None:
+        """Credit the time `monitor` waited instead of ticking.
+
+        Arguments:
+            waited: The time in milliseconds, nothing is credited if it
+                is not positive.
+        """
+        if waited > 0:
+            for pin in self._pins_ordered:
+                pin.count_up(waited)
 
-        for number, pin in self.get_pins().items():
-            pin.tick(self.is_raw_pin_active(number))
+    def monitor(self, realtime: bool = False):
+        """Monitor all registered pins ("lines") for a change in state.
 
-    def monitor(self):
-        """Monitor all registered pins ("lines") for a change in state."""
+        While no signal is being debounced the loop blocks in an epoll
+        (via `selectors`) on the lines' event file descriptors until the
+        kernel reports an edge, the next long or pulsed callback is due
+        or a second has passed. Only while a signal is being debounced
+        the pins are checked every `check_interval` milliseconds.
+
+        Arguments:
+            realtime: Use real-time scheduling for the loop, see
+                `set_realtime`.
+        """
         if not self._chip is None:
             logger.error(
                 'chip has already been opend using the context manager')
             return
 
-        with self.open_chip() as chip:
-            self._chip = chip
+        # `_open_chip` sets `_chip` and `_close_chip` resets it
+        with self.open_chip(), selectors.DefaultSelector() as selector:
             try:
+                if realtime:
+                    self.set_realtime()
                 logger.debug('starting the loop')
+                for line in self._line_by_pin.values():
+                    selector.register(line.event_get_fd(),
+                                      selectors.EVENT_READ, line)
+                # bind everything the loop needs to locals
+                tick: Callable[[], None] = self.tick
+                monotonic: Callable[[], float] = time.monotonic
+                check_interval: int = self.check_interval
+                interval: float = check_interval / 1000
+                # catch signals that are already active
+                tick()
+                next_tick: float = monotonic()
                 while True:
-                    # check according to interval
-                    time.sleep(self.check_interval / 1000)
-                    self.tick()
+                    # kept up to date by `_tick_open` for all pins
+                    debouncing: bool = self._debouncing_bits != 0
+                    start: float = monotonic()
+                    deadline: float = self._next_deadline(
+                            next_tick, start, interval, debouncing)
+                    # edges end the wait early only if nothing is being
+                    # debounced
+                    now: float = self._wait_until(selector, deadline,
+                                                  not debouncing)
+                    if debouncing:
+                        next_tick = deadline
+                    else:
+                        next_tick = now
+                        # the following tick adds another
+                        # `check_interval`
+                        self._count_up(int((now - start) * 1000)
+                                       - check_interval)
+                    tick()
             except KeyboardInterrupt:
                 sys.exit(130)
-        self._chip = None
+
+
+class ChipContext:
+    """Context manager returned by `GPIODMonitor.open_chip`.
+
+    A plain class instead of a generator based context manager, so
+    entering and leaving is just two method calls.
+
+    Attributes:
+        _monitor: The monitor whose chip to open.
+    """
+    __slots__ = ('_monitor',)
+
+    def __init__(self, owner: GPIODMonitor) -> None:
+        """Store the monitor.
+
+        Arguments:
+            owner: The monitor whose chip to open.
+        """
+        self._monitor: GPIODMonitor = owner
+
+    def __enter__(self) -> gpiod.Chip:
+        """Open the chip and request the lines.
+
+        Returns:
+            The handle of the chip.
+        """
+        # pylint: disable=protected-access
+        try:
+            return self._monitor._open_chip()
+        except BaseException:
+            # `__exit__` is not called if entering fails
+            self._monitor._close_chip()
+            raise
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Close the chip, even if an exception has been raised."""
+        # pylint: disable=protected-access
+        self._monitor._close_chip()
 
 
 if __name__ == '__main__':
@@ -469,13 +653,24 @@ if __name__ == '__main__':
                                      callback=dummy_long_active,
                                      seconds=3)
 
-    with monitor.open_chip():
-        try:
-            while True:
-                # check according to interval
-                time.sleep(monitor.check_interval / 1000)
-                monitor.tick()
-        except KeyboardInterrupt:
-            sys.exit(130)
-        # or use (equivalent but you don't have controll over the loop):
-        # chip.monitor()
+    # sleeps until an edge is detected while nothing is being debounced
+    monitor.monitor()
+    # or use (if you need controll over the loop, but this polls every
+    # `check_interval` milliseconds):
+    # with monitor.open_chip():
+    #     try:
+    #         interval = monitor.check_interval / 1000
+    #         next_tick = time.monotonic()
+    #         while True:
+    #             # sleep until the next tick is due so the time spent
+    #             # in `tick` does not add up
+    #             next_tick += interval
+    #             slack = next_tick - time.monotonic()
+    #             if slack > 0:
+    #                 time.sleep(slack)
+    #             else:
+    #                 # behind, skip the missed ticks
+    #                 next_tick -= slack
+    #             monitor.tick()
+    #     except KeyboardInterrupt:
+    #         sys.exit(130)
@@ -0,0 +1,488 @@
+"""
+A single pin ("line") and its debouncing, used by `GPIODMonitor`.
+
+Kept apart from `gpiodmonitor.gpiodmonitor` which talks to the chip,
+this module does not depend on python3-gpiod.
+"""
+
+import bisect
+import dataclasses
+import heapq
+import logging
+import sys
+
+from typing import Any, Callable, Final, List, Optional, Tuple
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# configure time [ms] over which a new signal has to be stable before
+# a change in state is assumed
+
+# after which time to check the state [ms]
+DEBOUNCE_CHECK_INTERVAL: Final[int] = 5
+# how long has a change to "active" to be stable [ms]
+DEBOUNCE_ACTIVE_INTERVAL: Final[int] = 10
+# how long has a change to "inactive" to be stable [ms]
+DEBOUNCE_INACTIVE_INTERVAL: Final[int] = 100
+
+
+def call_now(callback: Callable[[Any], None], argument: Any) -> None:
+    """Call the callback right away (the default dispatcher).
+
+    Arguments:
+        callback: The function to call.
+        argument: The argument to call it with.
+    """
+    callback(argument)
+
+
+@dataclasses.dataclass
+class TimedCallback:
+    """Holds a modifieable time in ms and a callback."""
+    callback: Callable[[int], None]
+    time: int = 0
+
+
+def insort_timed(callbacks: List[TimedCallback],
+                 timed_callback: TimedCallback) -> None:
+    """Insert a callback into a list sorted by time, keeping it sorted.
+
+    Callbacks with the same time stay in the order of registration.
+
+    Arguments:
+        callbacks: The list sorted by `TimedCallback.time`.
+        timed_callback: The callback to insert.
+    """
+    # `bisect` only accepts a key from Python 3.10 on
+    index: int = bisect.bisect_right([item.time for item in callbacks],
+                                     timed_callback.time)
+    callbacks.insert(index, timed_callback)
+
+
+class GPIOPin:
+    # pylint: disable=too-many-instance-attributes
+    """Class to hold data associated with each registered pin.
+
+    Holds:
+    * the current state (this will only change after debouncing the
+      signal)
+    * the state of the countdown
+    * a list of callback functions to be called on a change to active /
+      inactive
+
+    Attributes:
+        _num: The number of the pin.
+        _active: Is the pin in active state?
+        _countdown: This is activated on raw pin state change and
+            decreases by `check_interval` ms with every tick. If it
+            reaches zero (or less) the state is asssumed to be stable.
+        _countup: This counts up as soon as an active signal is stable.
+            This is used to trigger callbacks in `on_long_active`.
+        on_active: Functions to call on state change to "active".
+            Read-only, add to it via `GPIODMonitor.register` (or call
+            `freeze_callbacks` after changing it).
+        on_inactive: Functions to call on state change to "inactive".
+            Read-only like `on_active`.
+        on_long_active: Functions to call if the state has been
+            "active" for X ms. Read-only, add to it via
+            `GPIODMonitor.register_long_active` (or call
+            `invalidate_long` after changing it).
+        on_pulsed_active: Functions to call repetitively in intervals of
+            X ms if the state stays "active". Read-only, add to it via
+            `GPIODMonitor.register_pulsed_active` (or call
+            `invalidate_pulsed` after changing it).
+        _long_head: The index of the next callback in `_long_times` /
+            `_long_callbacks` to fire. All callbacks before it have
+            already been fired.
+        _stack_pulsed: A min-heap of `[time, index, timed_callback]`
+            lists, the time `timed_callback` from `on_pulsed_active`
+            fires next. `index` only keeps equal times from comparing
+            the callbacks.
+        _check_interval: The interval with which the pin is ticked in
+            milliseconds.
+        _active_interval: The interval it takes for a stable active
+            signal to trigger a change in state in milliseconds.
+        _inactive_interval: The interval it takes for a stable inactive
+            signal to trigger a change in state in milliseconds.
+        _reload: The values to reset `_countdown` to while inactive /
+            active (indexed by `_active`).
+        _next_due: The value of `_countup` at which the next callback in
+            `on_long_active` or `_stack_pulsed` is due. `sys.maxsize`
+            if the pin is inactive or no callback is pending, so pins
+            without timed callbacks skip counting up altogether.
+        events: A list shared by all pins of a monitor to collect the
+            stable state changes for batch callbacks. `None` if no
+            batch callbacks are registered.
+        dispatch: Function that calls a callback with an argument,
+            either right away (`call_now`) or by the monitor's callback
+            thread.
+        debug: Whether to log the state changes, i.e. if the logger
+            was enabled for DEBUG when the chip was opened.
+        _fire_active: `on_active` frozen into a tuple by
+            `freeze_callbacks`, the callbacks `set_state` calls.
+        _fire_inactive: `on_inactive` frozen into a tuple.
+        _long_times: The times of `on_long_active` frozen into a tuple
+            by `reset_long`.
+        _long_callbacks: The callbacks of `on_long_active` in the same
+            order, so firing them does not need to unpack the
+            `TimedCallback`s.
+        _long_stale: Has `on_long_active` changed since `reset_long`
+            built the tuples?
+        _pulsed_stale: Has `on_pulsed_active` changed since
+            `reset_pulsed` built the heap entries?
+    """
+    # save some space by using slots
+    __slots__ = ('_num', '_active', '_countdown', '_countup', 'on_active',
+                 'on_inactive', 'on_long_active', 'on_pulsed_active',
+                 '_long_head', '_stack_pulsed', '_next_due', 'events',
+                 'dispatch', 'debug', '_fire_active', '_fire_inactive',
+                 '_long_times', '_long_callbacks', '_long_stale',
+                 '_pulsed_stale',
+                 '_check_interval', '_active_interval', '_inactive_interval',
+                 '_reload')
+
+    def __init__(self,
+                 num: int,
+                 check_interval: int = DEBOUNCE_CHECK_INTERVAL,
+                 active_interval: int = DEBOUNCE_ACTIVE_INTERVAL,
+                 inactive_interval: int = DEBOUNCE_INACTIVE_INTERVAL) -> None:
+        """Initialise the accessible variables.
+
+        Arguments:
+            num: The number of the pin.
+            check_interval: The interval with which the pin is ticked in
+                milliseconds.
+            active_interval: The interval it takes for a stable active
+                signal to trigger a change in state in milliseconds.
+            inactive_interval: The interval it takes for a stable
+                inactive signal to trigger a change in state in
+                milliseconds.
+        """
+
+        self._num: int = num
+        # per pin so monitors with different settings do not interfere
+        self._check_interval: int = check_interval
+        self._active_interval: int = active_interval
+        self._inactive_interval: int = inactive_interval
+        # the countdown to start with, indexed by `_active`
+        self._reload: Tuple[int, int] = (self._active_interval,
+                                         self._inactive_interval)
+        # key is initially assumed to be not pressed
+        self._active: bool = False
+        # the countdown to accept a signal as "pressed"
+        self._countdown: int = self._active_interval
+        # the countup to accept a signal  as "long_pressed"
+        self._countup: int = 0
+        self.on_active: List[Callable[[int], None]] = []
+        self.on_inactive: List[Callable[[int], None]] = []
+        # list of callback functions that should be fired after a
+        # certain interval
+        self.on_long_active: List[TimedCallback] = []
+        # list of callback functions that should be fired certain
+        # intervals
+        self.on_pulsed_active: List[TimedCallback] = []
+        # working copy
+        self._long_head: int = 0
+        self._stack_pulsed: List[List[Any]] = []
+        self._next_due: int = sys.maxsize
+        self.events: Optional[List[Tuple[int, bool]]] = None
+        self.dispatch: Callable[[Callable[[Any], None], Any], None] = call_now
+        self.debug: bool = True
+        self._fire_active: Tuple[Callable[[int], None], ...] = ()
+        self._fire_inactive: Tuple[Callable[[int], None], ...] = ()
+        self._long_times: Tuple[int, ...] = ()
+        self._long_callbacks: Tuple[Callable[[int], None], ...] = ()
+        self._long_stale: bool = False
+        self._pulsed_stale: bool = False
+
+    def set_state(self, active: bool) -> None:
+        """This function is called once the signal has stably changed.
+
+        Attributes:
+            active: Is the state "active"?
+        """
+
+        # a plain test instead of a call into `logging` on every change
+        if self.debug:
+            logger.debug('pin: %s, state: %s', self._num, active)
+        self._active = active
+        if self.events is not None:
+            self.events.append((self._num, active))
+        dispatch: Callable[[Callable[[Any], None], Any], None] = \
+            self.dispatch
+        num: int = self._num
+        for callback in self._fire_active if active else self._fire_inactive:
+            dispatch(callback, num)
+
+    def freeze_callbacks(self) -> None:
+        """Copy `on_active` and `on_inactive` for `set_state`.
+
+        Tuples are a little faster to iterate and cannot be changed by a
+        callback while they are being iterated. Has to be called
+        whenever the lists are changed, `GPIODMonitor.register` does.
+        """
+        self._fire_active = tuple(self.on_active)
+        self._fire_inactive = tuple(self.on_inactive)
+
+    def is_active(self) -> bool:
+        """Is the pin active?
+
+        Returns:
+            Is the stable state of the pin "active"?
+        """
+        return self._active
+
+    def is_debouncing(self) -> bool:
+        """Is a countdown running?
+
+        Returns:
+            Does the raw state differ from the stable state?
+        """
+        return self._countdown != self._reload[self._active]
+
+    def needs_tick(self) -> bool:
+        """Does the pin need a tick even if its raw state is unchanged?
+
+        Returns:
+            Is a countdown running or is the pin counting up?
+        """
+        return self._next_due != sys.maxsize or self.is_debouncing()
+
+    def is_counting_up(self) -> bool:
+        """Is the pin counting up towards a timed callback?
+
+        Returns:
+            Is the pin active with long or pulsed callbacks pending?
+        """
+        return self._next_due != sys.maxsize
+
+    def get_time_to_due(self) -> int:
+        """Return the time until the next timed callback is due.
+
+        Returns:
+            The time in milliseconds, `sys.maxsize` if the pin is not
+            active or no long or pulsed callbacks are pending.
+        """
+        if self._next_due == sys.maxsize:
+            return sys.maxsize
+        return self._next_due - self._countup
+
+    def count_up(self, interval: int) -> None:
+        """Count up an active pin without a tick.
+
+        Used to account for the time the monitor waited instead of
+        ticking. The raw state is assumed to have been stable.
+
+        Arguments:
+            interval: The time in milliseconds.
+        """
+        if self._next_due != sys.maxsize:
+            self._countup += interval
+            if self._countup >= self._next_due:
+                self.fire_due()
+
+    def reset_countdown(self) -> None:
+        """Reset the countdown for a signal to be stable.
+
+        The length of the interval before a signal is considered stable
+        depends on the state. React faster for changes to "active", the
+        user might not be patient.
+        """
+
+        # indexed by the state, so no need to branch
+        self._countdown = self._reload[self._active]
+
+    def invalidate_long(self) -> None:
+        """Have `reset_long` rebuild the tuples of long callbacks.
+
+        Has to be called whenever `on_long_active` is changed,
+        `GPIODMonitor.register_long_active` does.
+        """
+        self._long_stale = True
+
+    def reset_long(self) -> None:
+        """Start over with the first long callback.
+
+        The tuples are only built anew if `on_long_active` has changed
+        since the last press, so callbacks registered while the pin is
+        active take effect with the next press.
+        """
+
+        if self._long_stale:
+            self._long_times = tuple(
+                    item.time for item in self.on_long_active)
+            self._long_callbacks = tuple(
+                    item.callback for item in self.on_long_active)
+            self._long_stale = False
+        self._long_head = 0
+
+    def invalidate_pulsed(self) -> None:
+        """Have `reset_pulsed` rebuild the heap entries.
+
+        Has to be called whenever `on_pulsed_active` is changed,
+        `GPIODMonitor.register_pulsed_active` does.
+        """
+        self._pulsed_stale = True
+
+    def reset_pulsed(self) -> None:
+        """Reset the heap of pulsed callbacks to their first pulse.
+
+        The entries are reused from press to press, they are only
+        created anew if `on_pulsed_active` has changed in between. Each
+        entry holds its callback, so callbacks registered while the pin
+        is active do not disturb the heap and take effect with the next
+        press.
+        """
+
+        pulsed: List[List[Any]] = self._stack_pulsed
+        if self._pulsed_stale:
+            pulsed[:] = [[0, i, timed_callback] for i, timed_callback
+                         in enumerate(self.on_pulsed_active)]
+            self._pulsed_stale = False
+        for entry in pulsed:
+            entry[0] = entry[2].time
+        heapq.heapify(pulsed)
+
+    def set_next_due(self) -> None:
+        """Determine when the next timed callback is due.
+
+        Both lists are sorted so only the next items have to be looked
+        at.
+        """
+
+        self._next_due = min(
+                self._long_times[self._long_head]
+                if self._long_head < len(self._long_times)
+                else sys.maxsize,
+                self._stack_pulsed[0][0] if self._stack_pulsed
+                else sys.maxsize)
+
+    def fire_due(self) -> None:
+        """Fire all long and pulsed callbacks that are due."""
+
+        # the list is sorted by the length needed for the signal to be
+        # active, so advance the head until the first callback that
+        # needs an even larger value of `_countup`
+        num: int = self._num
+        countup: int = self._countup
+        times: Tuple[int, ...] = self._long_times
+        callbacks: Tuple[Callable[[int], None], ...] = self._long_callbacks
+        count: int = len(times)
+        head: int = self._long_head
+        while head < count and countup >= times[head]:
+            self.dispatch(callbacks[head], num)
+            head += 1
+        self._long_head = head
+
+        # check if it is time to fire a pulsed event, the earliest one
+        # is always on top of the heap
+        pulsed: List[List[Any]] = self._stack_pulsed
+        while pulsed and countup >= pulsed[0][0]:
+            entry: List[Any] = pulsed[0]
+            timed_callback: TimedCallback = entry[2]
+            self.dispatch(timed_callback.callback, num)
+            # set time for next pulse by adding the original interval to
+            # the time of the current pulse and move it down the heap
+            entry[0] += timed_callback.time
+            heapq.heapreplace(pulsed, entry)
+
+        self.set_next_due()
+
+    def tick(self, raw_active: int) -> None:
+        """Debounce a change to active / inactive.
+
+        `GPIODMonitor` only calls this function (every `check_interval`
+        milliseconds) while the raw state differs from the stable state
+        or the pin needs a tick anyway (see `needs_tick`), and
+        `GPIODMonitor.monitor` only ticks while a signal is being
+        debounced. Unchanged, idle pins are skipped.
+
+        If the raw state of a pin differs from its known state this
+        function tries to determine if it's a real change or just
+        noise:
+        A countdown is started and with every check that holds the new
+        state the count is decreased.
+        If the count reaches 0 the new state is accepted. If a the old
+        state is detected inbetween the countdown is reset and starts
+        again if a new state is detected.
+
+        Example for DEBOUNCE_CHECK_INTERVAL = 5 ms and
+        DEBOUNCE_ACTIVE_INTERVAL = 15 ms
+
+        Time [ms]:  0  5 10 15 20 25 30 35
+        Check:      1  2  3  4  5  6  7  8
+        Signal:     0  1  1  0  1  1  1  1
+                       ^  ^  ^  ^  ^  ^  ^
+                       |  |  |  |  |  |  |
+                       |  |  |  |  |  |  no change -> do nothing
+                       |  |  |  |  |  signal stable -> count reaches 0
+                       |  |  |  |  |                -> emit event
+                       |  |  |  |  signal stable -> count decreases
+                       |  |  |  countdown starts
+                       |  |  signal does not seem stable -> reset
+                       |  signal stable -> count decreased
+                       countdown starts
+
+        Adaption of: https://my.eng.utah.edu/~cs5780/debouncing.pdf
+
+        Arguments:
+            raw_active: The value as read from the pin ("line"), 1 or
+                `True` if active.
+        """
+
+        # runs per visited pin and tick, the interpreter overhead that
+        # ranks second in the cost of a tick (see the ranking in
+        # `GPIODMonitor._tick_open`), so keep it to plain attribute
+        # access and integer arithmetic without allocations
+        # read each attribute once, every lookup counts at this rate
+        active: bool = self._active
+        if not raw_active and not active:
+            # the idle case: nothing to count up, just make sure any
+            # countdown towards "active" starts over
+            self._countdown = self._active_interval
+            return
+
+        if raw_active == active:
+            # state does not differ from the last accepted state
+            # so reset the countdown (`reset_countdown` inlined)
+            self._countdown = self._reload[active]
+            next_due: int = self._next_due
+            # if the state is active and timed callbacks are pending
+            if next_due != sys.maxsize:
+                # count up
+                countup: int = self._countup + self._check_interval
+                self._countup = countup
+                # a single comparison on most ticks, only walk the
+                # callbacks if at least one of them is due
+                if countup >= next_due:
+                    self.fire_due()
+        else:
+            # state is not the last accepted state
+            # so decrease the count by DEBOUNCE_CHECK_INTERVAL
+            countdown: int = self._countdown - self._check_interval
+            self._countdown = countdown
+
+            # intervals need not be multiples of the check interval so
+            # the countdown may skip zero
+            if countdown <= 0:
+                # signal seems stable
+                # accept the new state, which is always the opposite
+                # of the old one (and keeps `_active` a bool)
+                active = not active
+                self.set_state(active)
+                # if the new state is active
+                if active:
+                    # prepare the countdown for the next change (the
+                    # same as `reset_countdown` but without testing the
+                    # state again)
+                    self._countdown = self._inactive_interval
+                    # start over with the first long callback
+                    self.reset_long()
+                    self.reset_pulsed()
+                    # and reset countup
+                    self._countup = 0
+                    self.set_next_due()
+                else:
+                    self._countdown = self._active_interval
+                    # nothing to count up while inactive
+                    self._next_due = sys.maxsize